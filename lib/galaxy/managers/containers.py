@@ -7,14 +7,21 @@ and other (nested) containers.
 # Histories should be DatasetCollections.
 # Libraries should be DatasetCollections.
 import logging
-import operator
+import weakref
+
+import sqlalchemy
+from sqlalchemy import event
+from sqlalchemy.orm import eagerload, scoped_session
 
 import galaxy.exceptions
-import galaxy.util
 from galaxy import model
 
 log = logging.getLogger(__name__)
 
+#: sqlite aborts statements with more than 999 bound parameters
+#  (SQLITE_MAX_VARIABLE_NUMBER) - stay safely under it when chunking INs
+SQLITE_MAX_IN_PARAMS = 900
+
 
 # ====
 class ContainerManagerMixin(object):
@@ -34,16 +41,40 @@ class ContainerManagerMixin(object):
     subcontainer_class = None
     #: how any contents lists produced are ordered - (string) attribute name to sort on or tuple of attribute names
     default_order_by = None
+    #: (string) name of the column used to order contents lists in SQL
+    order_contents_column = None
+    #: relationship paths to eager-load per content class when batch loading,
+    #  so iterating contents does not fan out into per-row lazy loads
+    _eager_loads = {}
 
     # ---- interface
     def contents(self, container):
         """
         Returns both types of contents: filtered and in some order.
+
+        Contained and subcontainer rows are fetched in a single UNION ALL
+        query and ordered by the database, saving a round-trip and a
+        Python-side merge per listing.
+
+        Rows are streamed from the server as a generator so that large
+        containers do not materialize all their contents before the first
+        row reaches the caller.
+        """
+        statement, params = self._contents_statement(container)
+        statement = statement.execution_options(stream_results=True)
+        for row in self.session().execute(statement, params):
+            yield row
+
+    def contents_all(self, container):
+        """
+        Returns both types of contents as a fully materialized list.
+
+        Prefer this over `contents` when every row is consumed anyway
+        (e.g. for serialization) - a single fetchall skips the per-row
+        overhead of streaming iteration.
         """
-        iters = []
-        iters.append(self.contained(container))
-        iters.append(self.subcontainers(container))
-        return galaxy.util.merge_sorted_iterables(self.order_contents_on, *iters)
+        statement, params = self._contents_statement(container)
+        return self.session().execute(statement, params).fetchall()
 
     def contained(self, container, **kwargs):
         """
@@ -57,18 +88,245 @@ class ContainerManagerMixin(object):
         """
         return self._filter_contents(container, self.subcontainer_class, **kwargs)
 
+    def batch_dispatch(self, rows):
+        """
+        Resolve content `rows` (as produced by `contents`) to full model
+        instances, in the original row order.
+
+        Rather than dispatching to a manager and fetching per row (an N+1
+        query pattern), rows are grouped by content class and each group is
+        fetched with a single `WHERE id IN (...)` query.
+        """
+        ids_by_class = {}
+        row_keys = []
+        for row in rows:
+            content_class = self._content_class_for_row(row)
+            ids_by_class.setdefault(content_class, []).append(row.id)
+            row_keys.append((content_class, row.id))
+        id_maps = {}
+        for content_class, id_list in ids_by_class.items():
+            id_maps[content_class] = self._id_map(content_class, id_list)
+        return [id_maps[content_class][content_id] for content_class, content_id in row_keys]
+
+    def invalidate(self, container):
+        """
+        Drop any cached contents for `container`.
+
+        Session flushes clear the whole cache automatically; this hook is
+        for write paths that bypass the session's unit of work (e.g. Core
+        updates/deletes).
+        """
+        cache = self._contents_cache
+        for key in [key for key in cache if key[1] == container.id]:
+            del cache[key]
+
     # ---- private
     def _filter_contents(self, container, content_class, **kwargs):
         # TODO: use list (or by_history etc.)
-        container_filter = self._filter_to_contained(container, content_class)
+        cache = self._contents_cache
+        key = (content_class, container.id)
+        if key not in cache:
+            cache[key] = self._core_select(container, content_class).fetchall()
+        return cache[key]
+
+    @property
+    def _contents_cache(self):
+        """
+        Memo of contents fetches keyed by (content class, container id).
+
+        Request handling often lists the same container several times (for
+        counts, then listings, then permission checks); caching the rows
+        avoids re-compiling and re-executing an identical statement.
+
+        Managers are long-lived and shared across request threads while
+        sessions are thread-scoped, so the memo holds one map per actual
+        session instance (the scoped_session proxy is resolved to the
+        session it currently manages) in a WeakKeyDictionary - each map
+        dies with its session, is never shared between threads, and is
+        cleared whenever its session flushes so writes cannot be served
+        stale rows.
+        """
+        session = self.session()
+        if isinstance(session, scoped_session):
+            session = session()
+        # setdefault is a single atomic dict operation, so concurrent first
+        # accesses cannot clobber each other's maps or double-register the
+        # flush listener
+        caches = self.__dict__.setdefault('_contents_cache_by_session', weakref.WeakKeyDictionary())
+        cache = caches.get(session)
+        if cache is None:
+            new_cache = {}
+            cache = caches.setdefault(session, new_cache)
+            if cache is new_cache:
+                event.listen(session, 'after_flush', self._clear_contents_cache)
+        return cache
+
+    def _clear_contents_cache(self, session, flush_context):
+        caches = getattr(self, '_contents_cache_by_session', None)
+        if caches is not None:
+            cache = caches.get(session)
+            if cache is not None:
+                cache.clear()
+
+    #: lazily built Core selects shared per (manager class, content class)
+    _select_cache = {}
+
+    def _core_select(self, container, content_class):
+        """
+        Return a Core result of `content_class` rows within `container`.
+
+        Skips ORM hydration (identity map, attribute instrumentation) since
+        most callers only read column values off the rows when merging.
+
+        The select is built and compiled once per (manager class, content
+        class) with a `container_id` bind parameter filled in at execute
+        time, rather than re-generating the statement on every call.
+        """
+        container_column = self._container_column(content_class)
+        if container_column is None:
+            # no single foreign key column links this class to its container -
+            # build the filter per call
+            statement = (sqlalchemy.select([content_class.table])
+                .where(self._get_filter_for_contained(container, content_class))
+                .order_by(self._order_column(content_class))
+                .execution_options(stream_results=True))
+            return self.session().execute(statement)
+
+        cache_key = (self.__class__, content_class)
+        statement = self._select_cache.get(cache_key)
+        if statement is None:
+            statement = (sqlalchemy.select([content_class.table])
+                .where(container_column == sqlalchemy.bindparam('container_id'))
+                .order_by(self._order_column(content_class))
+                .execution_options(stream_results=True))
+            self._select_cache[cache_key] = statement
+        return self.session().execute(statement, dict(container_id=container.id))
+
+    def _container_column(self, content_class):
+        """
+        Return the foreign key column linking `content_class` rows to their
+        container, or None if there is no single such column.
+        """
+        return None
+
+    def _content_class_for_row(self, row):
+        """Return the content class tagged in a union row."""
+        for content_class in (self.contained_class, self.subcontainer_class):
+            if row.type_tag == content_class.__name__:
+                return content_class
+        raise TypeError('Unknown contents type: ' + str(row.type_tag))
+
+    def _id_map(self, content_class, id_list):
+        """Return an id to model map of all `content_class` rows in `id_list`."""
+        if not id_list:
+            return {}
+        id_map = {}
+        for id_chunk in self._in_chunks(id_list):
+            query = (self.session().query(content_class)
+                .filter(content_class.id.in_(id_chunk)))
+            for eager_path in self._eager_loads.get(content_class, ()):
+                query = query.options(eagerload(eager_path))
+            id_map.update((row.id, row) for row in query)
+        return id_map
+
+    def _in_chunks(self, id_list, batch_size=SQLITE_MAX_IN_PARAMS):
+        """
+        Split `id_list` into lists usable as IN clause parameters.
+
+        Only sqlite needs the split (it limits bound parameters per
+        statement); other backends keep a single large IN.
+        """
+        if (len(id_list) <= batch_size
+                or self.session().get_bind().dialect.name != 'sqlite'):
+            return [id_list]
+        return [id_list[i:i + batch_size] for i in range(0, len(id_list), batch_size)]
+
+    #: specialization table: mixin subclass -> pre-built union contents
+    #  statement with a container_id bind parameter (None where the subclass
+    #  cannot be specialized)
+    _contents_select_table = {}
+
+    def _contents_statement(self, container):
+        """
+        Return `(statement, params)` for the union contents query.
+
+        The statement is specialized once per mixin subclass, resolving the
+        content classes, linking columns, and sort columns at build time
+        rather than on every call. Subclasses with a content class that has
+        no single linking foreign key column cannot be specialized and fall
+        back to the per-call builder.
+        """
+        cls = self.__class__
+        if cls not in self._contents_select_table:
+            self._contents_select_table[cls] = self._build_specialized_contents_select()
+        statement = self._contents_select_table[cls]
+        if statement is None:
+            return self._union_of_contents_select(container), {}
+        return statement, dict(container_id=container.id)
+
+    def _build_specialized_contents_select(self):
+        selects = []
+        for content_class in (self.contained_class, self.subcontainer_class):
+            container_column = self._container_column(content_class)
+            if container_column is None:
+                return None
+            columns = [
+                sqlalchemy.literal(content_class.__name__).label('type_tag'),
+                self._order_column(content_class).label('order_key'),
+                content_class.table.c.id.label('id'),
+            ]
+            selects.append(sqlalchemy.select(columns)
+                .where(container_column == sqlalchemy.bindparam('container_id')))
+        return sqlalchemy.union_all(*selects).order_by(sqlalchemy.column('order_key'))
+
+    def _union_of_contents_select(self, container):
+        """
+        Build one UNION ALL statement over both content classes, projecting
+        `(type_tag, order_key, id)` per row and ordered on the order key.
+
+        The `type_tag` column (the content class name) allows callers to
+        dispatch each row back to the manager for its class.
+        """
+        selects = []
+        for content_class in (self.contained_class, self.subcontainer_class):
+            columns = [
+                sqlalchemy.literal(content_class.__name__).label('type_tag'),
+                self._order_column(content_class).label('order_key'),
+                content_class.table.c.id.label('id'),
+            ]
+            selects.append(sqlalchemy.select(columns)
+                .where(self._get_filter_for_contained(container, content_class)))
+        return sqlalchemy.union_all(*selects).order_by(sqlalchemy.column('order_key'))
+
+    def _order_column(self, content_class):
+        table = content_class.table
+        if self.order_contents_column and self.order_contents_column in table.c:
+            return table.c[self.order_contents_column]
+        # subclasses may not declare a sort column, and not all content
+        # classes share the declared one (e.g. DatasetCollection has no
+        # element_index) - fall back to the primary key
+        return table.c.id
+
+    def _orm_query(self, container, content_class, **kwargs):
+        """
+        Return an ORM query for callers that need full model instances.
+        """
+        container_filter = self._get_filter_for_contained(container, content_class)
         query = self.session().query(content_class).filter(container_filter)
         return query
 
     def _get_filter_for_contained(self, container, content_class):
         raise galaxy.exceptions.NotImplemented('Abstract class')
 
+    #: content class -> name of the manager attribute that handles it
+    _manager_map = {}
+
     def _content_manager(self, content):
-        raise galaxy.exceptions.NotImplemented('Abstract class')
+        # a single hash lookup instead of a chain of isinstance comparisons
+        try:
+            return getattr(self, self._manager_map[content.__class__])
+        except KeyError:
+            raise TypeError('Unknown contents class: ' + str(content))
 
 
 class LibraryFolderAsContainerManagerMixin(ContainerManagerMixin):
@@ -78,20 +336,25 @@ class LibraryFolderAsContainerManagerMixin(ContainerManagerMixin):
     contained_class = model.LibraryDataset
     subcontainer_class = model.LibraryFolder
     # subcontainer_class = model.LibraryDatasetCollectionAssociation
-    order_contents_on = operator.attrgetter('create_time')
+    order_contents_column = 'create_time'
+    _eager_loads = {
+        model.LibraryDataset: ('library_dataset_dataset_association.dataset',),
+    }
 
     def _get_filter_for_contained(self, container, content_class):
         if content_class == self.subcontainer_class:
             return self.subcontainer_class.parent == container
         return self.contained_class.folder == container
 
-    def _content_manager(self, content):
-        # type snifffing is inevitable
-        if isinstance(content, model.LibraryDataset):
-            return self.lda_manager
-        elif isinstance(content, model.LibraryFolder):
-            return self.folder_manager
-        raise TypeError('Unknown contents class: ' + str(content))
+    def _container_column(self, content_class):
+        if content_class == self.subcontainer_class:
+            return self.subcontainer_class.table.c.parent_id
+        return self.contained_class.table.c.folder_id
+
+    _manager_map = {
+        model.LibraryDataset: 'lda_manager',
+        model.LibraryFolder: 'folder_manager',
+    }
 
 
 class DatasetCollectionAsContainerManagerMixin(ContainerManagerMixin):
@@ -99,18 +362,26 @@ class DatasetCollectionAsContainerManagerMixin(ContainerManagerMixin):
     # (note: unlike the other collections, dc's wrap both contained and subcontainers in this class)
     contained_class = model.DatasetCollectionElement
     subcontainer_class = model.DatasetCollection
-    order_contents_on = operator.attrgetter('element_index')
+    order_contents_column = 'element_index'
+    _eager_loads = {
+        model.DatasetCollectionElement: ('hda', 'child_collection'),
+        model.DatasetCollection: ('elements',),
+    }
 
     def _get_filter_for_contained(self, container, content_class):
         return content_class.collection == container
 
-    def _content_manager(self, content):
-        # type snifffing is inevitable
-        if isinstance(content, model.DatasetCollectionElement):
-            return self.collection_manager
-        elif isinstance(content, model.DatasetCollection):
-            return self.collection_manager
-        raise TypeError('Unknown contents class: ' + str(content))
+    def _container_column(self, content_class):
+        if content_class == self.contained_class:
+            return self.contained_class.table.c.dataset_collection_id
+        # nested DatasetCollections are linked through their elements, not a
+        # foreign key of their own
+        return None
+
+    _manager_map = {
+        model.DatasetCollectionElement: 'collection_manager',
+        model.DatasetCollection: 'collection_manager',
+    }
 
 
 # ====
@@ -101,6 +101,17 @@ class HistoryContentsManager(containers.ContainerManagerMixin):
         return self._union_of_contents(container,
             filters=filters, limit=limit, offset=offset, order_by=order_by, **kwargs)
 
+    def contents_all(self, container, filters=None, limit=None, offset=None, order_by=None, **kwargs):
+        """
+        Returns a fully materialized list of both/all types of contents.
+
+        Overrides the mixin's streaming entry point: `_union_of_contents`
+        already materializes and expands its results, which is what callers
+        that serialize every row (e.g. the contents API) want.
+        """
+        return self._union_of_contents(container,
+            filters=filters, limit=limit, offset=offset, order_by=order_by, **kwargs)
+
     def contents_count(self, container, filters=None, limit=None, offset=None, order_by=None, **kwargs):
         """
         Returns a count of both/all types of contents, based on the given filters.
@@ -209,6 +220,10 @@ class HistoryContentsManager(containers.ContainerManagerMixin):
     def _session(self):
         return self.app.model.context
 
+    def session(self):
+        # the mixin's generic methods (batch_dispatch, etc.) call session()
+        return self.app.model.context
+
     def _filter_to_contents_query(self, container, content_class, **kwargs):
         # TODO: use list (or by_history etc.)
         container_filter = self._get_filter_for_contained(container, content_class)
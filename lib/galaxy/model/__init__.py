@@ -6,10 +6,10 @@ the relationship cardinalities are obvious (e.g. prefer Dataset to Data)
 """
 import codecs
 import errno
+import heapq
 import json
 import logging
 import numbers
-import operator
 import os
 import pwd
 import socket
@@ -1539,7 +1539,18 @@ class History(HasTags, Dictifiable, UsesAnnotations, HasName):
             iters.append(self.__dataset_contents_iter(**kwds))
         if 'dataset_collection' in types:
             iters.append(self.__collection_contents_iter(**kwds))
-        return galaxy.util.merge_sorted_iterables(operator.attrgetter("hid"), *iters)
+        if len(iters) == 1:
+            return iter(iters[0])
+
+        # each iterable is already hid-ordered by the database, so only the
+        # k-way merge remains; heapq.merge does it in C rather than chaining
+        # python-level comparisons per row. Decorate each content with an
+        # (int hid, tiebreak) prefix so equal hids never compare the models.
+        def decorate(index, iterable):
+            for content in iterable:
+                yield (content.hid, index, content)
+        merged = heapq.merge(*[decorate(index, it) for index, it in enumerate(iters)])
+        return (entry[-1] for entry in merged)
 
     def __dataset_contents_iter(self, **kwds):
         return self.__filter_contents(HistoryDatasetAssociation, **kwds)
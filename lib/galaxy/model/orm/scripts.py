@@ -3,6 +3,7 @@ Code to support database helper scripts (create_db.py, manage_db.py, etc...).
 """
 import logging
 import os.path
+from collections import namedtuple
 
 from galaxy.util.path import get_ext
 from galaxy.util.properties import find_config_file, load_app_properties
@@ -14,37 +15,96 @@ DEFAULT_CONFIG_NAMES = ['galaxy', 'universe_wsgi']
 DEFAULT_CONFIG_PREFIX = ''
 DEFAULT_DATABASE = 'galaxy'
 
+#: per-database defaults for get_config - attribute access on the namedtuple
+#  is faster than the dict.get() probes it replaces and catches typos early
+DatabaseConfig = namedtuple('DatabaseConfig', [
+    'repo',
+    'config_names',
+    'default_sqlite_file',
+    'config_override',
+    'config_prefix',
+    'config_section',
+])
+
 DATABASE = {
-    "galaxy":
-        {
-            'repo': 'lib/galaxy/model/migrate',
-            'default_sqlite_file': './database/universe.sqlite',
-            'config_override': 'GALAXY_CONFIG_',
-        },
-    "tools":
-        {
-            'repo': 'lib/tool_shed/galaxy_install/migrate',
-            'default_sqlite_file': './database/universe.sqlite',
-            'config_override': 'GALAXY_CONFIG_',
-        },
-    "tool_shed":
-        {
-            'repo': 'lib/galaxy/webapps/tool_shed/model/migrate',
-            'config_names': ['tool_shed', 'tool_shed_wsgi'],
-            'default_sqlite_file': './database/community.sqlite',
-            'config_override': 'TOOL_SHED_CONFIG_',
-            'config_section': 'tool_shed',
-        },
-    "install":
-        {
-            'repo': 'lib/galaxy/model/tool_shed_install/migrate',
-            'config_prefix': 'install_',
-            'default_sqlite_file': './database/install.sqlite',
-            'config_override': 'GALAXY_INSTALL_CONFIG_',
-        },
+    "galaxy": DatabaseConfig(
+        repo='lib/galaxy/model/migrate',
+        config_names=DEFAULT_CONFIG_NAMES,
+        default_sqlite_file='./database/universe.sqlite',
+        config_override='GALAXY_CONFIG_',
+        config_prefix=DEFAULT_CONFIG_PREFIX,
+        config_section=None,
+    ),
+    "tools": DatabaseConfig(
+        repo='lib/tool_shed/galaxy_install/migrate',
+        config_names=DEFAULT_CONFIG_NAMES,
+        default_sqlite_file='./database/universe.sqlite',
+        config_override='GALAXY_CONFIG_',
+        config_prefix=DEFAULT_CONFIG_PREFIX,
+        config_section=None,
+    ),
+    "tool_shed": DatabaseConfig(
+        repo='lib/galaxy/webapps/tool_shed/model/migrate',
+        config_names=['tool_shed', 'tool_shed_wsgi'],
+        default_sqlite_file='./database/community.sqlite',
+        config_override='TOOL_SHED_CONFIG_',
+        config_prefix=DEFAULT_CONFIG_PREFIX,
+        config_section='tool_shed',
+    ),
+    "install": DatabaseConfig(
+        repo='lib/galaxy/model/tool_shed_install/migrate',
+        config_names=DEFAULT_CONFIG_NAMES,
+        default_sqlite_file='./database/install.sqlite',
+        config_override='GALAXY_INSTALL_CONFIG_',
+        config_prefix='install_',
+        config_section=None,
+    ),
 }
 
 
+#: memos for the filesystem walks get_config repeats per invocation - config
+#  file discovery is keyed on the searched directories and their mtimes (so
+#  adding or removing a config file invalidates the entry) and extension
+#  lookup is a pure function of its arguments
+_config_file_cache = {}
+_ext_cache = {}
+
+
+def _find_config_file_cached(config_names, dirs):
+    search_dirs = dirs or [os.getcwd(), os.path.join(os.getcwd(), 'config')]
+    dirs_state = tuple(
+        (search_dir, os.path.getmtime(search_dir) if os.path.exists(search_dir) else None)
+        for search_dir in search_dirs)
+    cache_key = (tuple(config_names), dirs_state)
+    if cache_key not in _config_file_cache:
+        _config_file_cache[cache_key] = find_config_file(config_names, dirs=dirs)
+    return _config_file_cache[cache_key]
+
+
+def _get_ext_cached(path, ignore):
+    cache_key = (path, ignore)
+    if cache_key not in _ext_cache:
+        _ext_cache[cache_key] = get_ext(path, ignore=ignore)
+    return _ext_cache[cache_key]
+
+
+#: memo of parsed config properties keyed on the file, its mtime, and the
+#  load options - repeated script invocations in one process (e.g. test
+#  fixtures driving manage_db) skip re-parsing the same file
+_properties_cache = {}
+
+
+def _load_app_properties_cached(config_file, config_override, config_section):
+    if config_file is None:
+        return load_app_properties(config_file=config_file, config_prefix=config_override, config_section=config_section)
+    cache_key = (config_file, os.path.getmtime(config_file), config_override, config_section)
+    if cache_key not in _properties_cache:
+        _properties_cache[cache_key] = load_app_properties(
+            config_file=config_file, config_prefix=config_override, config_section=config_section)
+    # copy so callers cannot mutate the cached properties
+    return dict(_properties_cache[cache_key])
+
+
 def read_config_file_arg(argv, config_names, cwd=None):
     if '-c' in argv:
         pos = argv.index('-c')
@@ -52,13 +112,24 @@ def read_config_file_arg(argv, config_names, cwd=None):
         return argv.pop(pos)
     if cwd:
         cwd = [cwd, os.path.join(cwd, 'config')]
-    return find_config_file(config_names, dirs=cwd)
+    return _find_config_file_cached(config_names, cwd)
+
 
+def _sqlite_url(database_file, readonly=False):
+    if readonly:
+        # IMMEDIATE takes sqlite's RESERVED lock at BEGIN, serializing
+        # writers - pointless contention for tools that only read
+        return "sqlite:///%s" % database_file
+    return "sqlite:///%s?isolation_level=IMMEDIATE" % database_file
 
-def get_config(argv, cwd=None):
+
+def get_config(argv, cwd=None, readonly=False):
     """
     Read sys.argv and parse out repository of migrations and database url.
 
+    Check-only scripts that never write (e.g. status commands) should pass
+    `readonly=True` so sqlite urls skip the IMMEDIATE isolation level.
+
     >>> import os
     >>> from ConfigParser import SafeConfigParser
     >>> from shutil import rmtree
@@ -82,6 +153,9 @@ def get_config(argv, cwd=None):
     'sqlite:///moo.sqlite?isolation_level=IMMEDIATE'
     >>> config['repo']
     'lib/galaxy/model/migrate'
+    >>> config = get_config(['manage_db.py'], cwd=config_dir, readonly=True)
+    >>> config['db_url']
+    'sqlite:///moo.sqlite'
     >>> rmtree(config_dir)
     """
     if argv and (argv[-1] in DATABASE):
@@ -90,25 +164,24 @@ def get_config(argv, cwd=None):
         database = 'galaxy'
     database_defaults = DATABASE[database]
 
-    config_names = database_defaults.get('config_names', DEFAULT_CONFIG_NAMES)
+    config_names = database_defaults.config_names
     config_file = read_config_file_arg(argv, config_names, cwd=cwd)
-    repo = database_defaults['repo']
-    config_prefix = database_defaults.get('config_prefix', DEFAULT_CONFIG_PREFIX)
-    config_override = database_defaults.get('config_override', 'GALAXY_CONFIG_')
-    default_sqlite_file = database_defaults['default_sqlite_file']
-    if not config_file or get_ext(config_file, ignore='sample') == 'yaml':
-        config_section = database_defaults.get('config_section', None)
+    repo = database_defaults.repo
+    config_prefix = database_defaults.config_prefix
+    config_override = database_defaults.config_override
+    default_sqlite_file = database_defaults.default_sqlite_file
+    if not config_file or _get_ext_cached(config_file, 'sample') == 'yaml':
+        config_section = database_defaults.config_section
     else:
         # An .ini file - just let load_app_properties find app:main.
         config_section = None
-    properties = load_app_properties(config_file=config_file, config_prefix=config_override, config_section=config_section)
+    properties = _load_app_properties_cached(config_file, config_override, config_section)
 
-    if ("%sdatabase_connection" % config_prefix) in properties:
-        db_url = properties["%sdatabase_connection" % config_prefix]
-    elif ("%sdatabase_file" % config_prefix) in properties:
-        database_file = properties["%sdatabase_file" % config_prefix]
-        db_url = "sqlite:///%s?isolation_level=IMMEDIATE" % database_file
-    else:
-        db_url = "sqlite:///%s?isolation_level=IMMEDIATE" % default_sqlite_file
+    # probe each key once and branch on the locals instead of paired
+    # `in`/`[]` lookups
+    db_url = properties.get(config_prefix + 'database_connection')
+    if db_url is None:
+        database_file = properties.get(config_prefix + 'database_file', default_sqlite_file)
+        db_url = _sqlite_url(database_file, readonly=readonly)
 
     return dict(db_url=db_url, repo=repo, config_file=config_file, database=database)
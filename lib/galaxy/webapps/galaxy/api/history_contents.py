@@ -748,7 +748,7 @@ class HistoryContentsController(BaseAPIController, UsesLibraryMixin, UsesLibrary
             details = util.listify(details)
         view = serialization_params.pop('view')
 
-        contents = self.history_contents_manager.contents(history,
+        contents = self.history_contents_manager.contents_all(history,
             filters=filters, limit=limit, offset=offset, order_by=order_by)
         for content in contents:
 
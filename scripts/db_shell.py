@@ -34,7 +34,7 @@ from galaxy.model.orm.scripts import get_config
 if sys.version_info > (3,):
     long = int
 
-db_url = get_config(sys.argv)['db_url']
+db_url = get_config(sys.argv, readonly=True)['db_url']
 sa_session = init('/tmp/', db_url).context
 
 
@@ -17,7 +17,7 @@ logging.basicConfig()
 log = logging.getLogger(__name__)
 
 # Get config file and load up SA session
-config = get_config(sys.argv)
+config = get_config(sys.argv, readonly=True)
 model = mapping.init('/tmp/', config['db_url'])
 sa_session = model.context.current
 
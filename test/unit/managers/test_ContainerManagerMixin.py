@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""
+"""
+import datetime
+import unittest
+from collections import namedtuple
+
+from sqlalchemy.orm import class_mapper
+
+from galaxy import model
+from galaxy.managers import containers
+from .base import BaseTestCase
+
+
+class FolderContentsManager(containers.LibraryFolderAsContainerManagerMixin):
+    """Minimal concrete manager over the library folder container mixin."""
+
+    def __init__(self, app):
+        self.app = app
+
+    def session(self):
+        return self.app.model.context
+
+
+# =============================================================================
+class ContainerManagerMixinTestCase(BaseTestCase):
+
+    def set_up_managers(self):
+        super(ContainerManagerMixinTestCase, self).set_up_managers()
+        self.contents_manager = FolderContentsManager(self.app)
+
+    def add_folder(self, name, parent=None, create_time=None):
+        folder = model.LibraryFolder(name=name)
+        folder.parent = parent
+        if create_time:
+            folder.create_time = create_time
+        self.app.model.context.add(folder)
+        self.app.model.context.flush()
+        return folder
+
+    def add_library_dataset(self, folder, name, create_time=None):
+        library_dataset = model.LibraryDataset(folder=folder, name=name)
+        if create_time:
+            library_dataset.create_time = create_time
+        self.app.model.context.add(library_dataset)
+        self.app.model.context.flush()
+        return library_dataset
+
+    def test_batch_dispatch(self):
+        root = self.add_folder('root')
+        time_0 = datetime.datetime(2017, 1, 1)
+        minute = datetime.timedelta(minutes=1)
+        dataset_1 = self.add_library_dataset(root, 'dataset-1', create_time=time_0)
+        subfolder = self.add_folder('subfolder', parent=root, create_time=(time_0 + minute))
+        dataset_2 = self.add_library_dataset(root, 'dataset-2', create_time=(time_0 + (2 * minute)))
+
+        self.log('rows should resolve to models of the tagged classes, in row order')
+        rows = list(self.contents_manager.contents(root))
+        contents = self.contents_manager.batch_dispatch(rows)
+        self.assertEqual(contents, [dataset_1, subfolder, dataset_2])
+
+        self.log('rows with an unknown type_tag should raise a TypeError')
+        FakeRow = namedtuple('FakeRow', ('type_tag', 'id'))
+        self.assertRaises(TypeError,
+            self.contents_manager.batch_dispatch, [FakeRow('NotAContentClass', 1)])
+
+    def test_contents_cache(self):
+        root = self.add_folder('root')
+        self.add_library_dataset(root, 'dataset-1')
+
+        self.log('repeated contained calls should be served from the memo')
+        first_fetch = self.contents_manager.contained(root)
+        self.assertIs(self.contents_manager.contained(root), first_fetch)
+
+        self.log('a session flush should clear the memo and expose new rows')
+        dataset_2 = self.add_library_dataset(root, 'dataset-2')
+        second_fetch = self.contents_manager.contained(root)
+        self.assertIsNot(second_fetch, first_fetch)
+        self.assertIn(dataset_2.id, [row.id for row in second_fetch])
+
+    def test_invalidate(self):
+        root = self.add_folder('root')
+        sibling = self.add_folder('sibling')
+        self.add_library_dataset(root, 'dataset-1')
+        self.add_library_dataset(sibling, 'dataset-2')
+        root_fetch = self.contents_manager.contained(root)
+        sibling_fetch = self.contents_manager.contained(sibling)
+
+        self.log('invalidate should drop only the given container from the memo')
+        self.contents_manager.invalidate(root)
+        self.assertIsNot(self.contents_manager.contained(root), root_fetch)
+        self.assertIs(self.contents_manager.contained(sibling), sibling_fetch)
+
+    def test_in_chunks(self):
+        self.log('short id lists should pass through as a single chunk')
+        ids = list(range(10))
+        self.assertEqual(self.contents_manager._in_chunks(ids), [ids])
+
+        self.log('on sqlite, id lists over the parameter limit should be split losing nothing')
+        ids = list(range(2000))
+        chunks = self.contents_manager._in_chunks(ids)
+        self.assertEqual(len(chunks), 3)
+        for chunk in chunks:
+            self.assertTrue(len(chunk) <= containers.SQLITE_MAX_IN_PARAMS)
+        self.assertEqual([id_ for chunk in chunks for id_ in chunk], ids)
+
+    def test_eager_load_paths(self):
+        self.log('declared eager-load paths should resolve to mapped relationships')
+        for mixin in (containers.LibraryFolderAsContainerManagerMixin,
+                      containers.DatasetCollectionAsContainerManagerMixin):
+            for content_class, paths in mixin._eager_loads.items():
+                for path in paths:
+                    mapped_class = content_class
+                    for attribute in path.split('.'):
+                        relationship = class_mapper(mapped_class).get_property(attribute)
+                        mapped_class = relationship.mapper.class_
+
+
+# =============================================================================
+if __name__ == '__main__':
+    # or more generally, nosetests test_resourcemanagers.py -s -v
+    unittest.main()